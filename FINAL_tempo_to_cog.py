@@ -1,4 +1,4 @@
-import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from google.cloud import storage
 from pathlib import Path
 import tempfile
@@ -6,10 +6,18 @@ import time
 import requests
 import re
 import json
+from functools import lru_cache
 from dotenv import load_dotenv
 import os
 import rasterio
+from rasterio.errors import RasterioIOError
+from rasterio.io import MemoryFile
+from rasterio.shutil import copy as copy_dataset
+from rasterio.features import geometry_mask
+from rasterio.transform import array_bounds
+from rasterio.windows import from_bounds
 import numpy as np
+from numba import njit, prange, set_num_threads
 
 load_dotenv()
 
@@ -21,138 +29,230 @@ GCS_BUCKET = os.getenv('GCS_BUCKET')
 GCS_BLOB_PREFIX = os.getenv('GCS_BLOB_PREFIX')
 GCS_BLOB_OUTPUT_PREFIX = os.getenv('GCS_BLOB_OUTPUT_PREFIX') + '2/'
 
+READ_FROM_GCS = True  # Range-read NetCDFs via /vsigs/; False downloads each file first
+
+# GDAL settings for reading NetCDFs directly from GCS over /vsigs/
+os.environ.setdefault('GDAL_HTTP_MULTIPLEX', 'YES')
+os.environ.setdefault('CPL_VSIL_CURL_ALLOWED_EXTENSIONS', '.nc')
+
 LA_BOUNDARY_URL = "https://tigerweb.geo.census.gov/arcgis/rest/services/TIGERweb/State_County/MapServer/0/query?where=NAME='Louisiana'&outFields=*&outSR=4326&f=geojson"
-LA_BOUNDARY = requests.get(LA_BOUNDARY_URL).json()
+CACHE_DIR = Path('~/.cache/tempo').expanduser()
+
+# Load the LA boundary GeoJSON, fetching it only when there's no local copy
+@lru_cache(maxsize=None)
+def load_la_boundary():
+    path = CACHE_DIR / 'la_boundary.geojson'
+    if not path.exists():
+        response = requests.get(LA_BOUNDARY_URL, timeout=10)
+        response.raise_for_status()
+        # Write then rename so concurrent workers never read a partial file
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_text(response.text)
+        os.replace(tmp_path, path)
+    return json.loads(path.read_text())
+
+# Rasterize the LA boundary onto a TEMPO grid (True outside LA).
+# The grid is the same for every file, so the mask is cached in memory and on disk.
+_la_masks = {}
+
+def get_la_mask(shape, transform):
+    bounds = array_bounds(shape[0], shape[1], transform)
+    key = (shape, tuple(round(b, 6) for b in bounds))
+    if key not in _la_masks:
+        path = CACHE_DIR / f"la_mask_{shape[0]}x{shape[1]}_{'_'.join(f'{b:.6f}' for b in bounds)}.npy"
+        if path.exists():
+            _la_masks[key] = np.load(path)
+        else:
+            outside = geometry_mask(
+                [load_la_boundary()['features'][0]['geometry']],
+                out_shape=shape,
+                transform=transform
+            )
+            # Write then rename so concurrent workers never read a partial file
+            CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+            with open(tmp_path, 'wb') as f:
+                np.save(f, outside)
+            os.replace(tmp_path, path)
+            _la_masks[key] = outside
+    return _la_masks[key]
+
+_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+_TEMPO_RE = re.compile(r'tempo_2024-\d{2}-\d{2}\.nc$') # any 2024 daily file
 
 # Extract date from filename
 def extract_date(filename):
-    match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
+    match = _DATE_RE.search(filename)
     if not match:
         print(f'✗ Could not extract date from {filename}')
     return match.group(1) if match else None
 
+# Daily max NO2 scaled straight to 8-bit in a single pass over the band cube.
+# Each row is streamed through all bands (NaNs ignored), then the LA mask and
+# the 0-scale -> 1-255 stretch are applied in the same loop; rows run in parallel.
+# Pixels outside the boundary, with no valid observation or a max of exactly 0
+# become 0 (nodata). Like gdal_translate's Byte output, the stretch clamps to
+# 0-255, so maxima more negative than -scale/508 round to 0 as well.
+@njit(parallel=True, cache=True)
+def daily_max_to_uint8(cube, outside, scale, out):
+    bands, height, width = cube.shape
+    for i in prange(height):
+        row_max = np.full(width, -np.inf)
+        for b in range(bands):
+            for j in range(width):
+                v = cube[b, i, j]
+                if v > row_max[j]:  # False for NaN
+                    row_max[j] = v
+        for j in range(width):
+            m = row_max[j]
+            if outside[i, j] or m == -np.inf or m == 0:
+                out[i, j] = 0
+            else:
+                out[i, j] = min(max(np.rint(m / scale * 254 + 1), 0), 255)
+
 # Convert TEMPO NetCDF to 8-bit COG
 def convert_tempo_to_8bit_cog(nc_file, output_file):
     LA_BOUNDS = [-94.043, 28.925, -88.817, 33.019]
-        
-    # manage temporary files
-    temp_all_bands = output_file.replace('.tif', '_allbands.tif')
-    temp_modified = output_file.replace('.tif', '_modified.tif')
-    temp_clipped = output_file.replace('.tif', '_clipped.tif')
-    temp_boundary = output_file.replace('.tif', '_boundary.geojson')
-    with open(temp_boundary, 'w') as f:
-        json.dump(LA_BOUNDARY, f)
 
     netcdf_path = f'NETCDF:"{nc_file}":vertical_column_troposphere'
 
-    # Step 1: Extract ALL bands
-    subprocess.run([
-        'gdal_translate',
-        '-of', 'GTiff',
-        '-projwin', str(LA_BOUNDS[0]), str(LA_BOUNDS[3]), str(LA_BOUNDS[2]), str(LA_BOUNDS[1]),
-        '-a_srs', 'EPSG:4269',
-        netcdf_path,
-        temp_all_bands
-    ], check=True)
-
-    # After Step 1, check how many bands were extracted
-    print(f"Checking bands in {temp_all_bands}...")
-    subprocess.run(['gdalinfo', temp_all_bands], check=True)
-
-    # Step 2: Calculte daily MAX (or mean) NO2 across all bands
+    # Step 1: Read ALL bands inside the LA bounding box
+    with rasterio.open(netcdf_path) as src:
+        window = from_bounds(*LA_BOUNDS, transform=src.transform).round_offsets().round_lengths()
+        transform = src.window_transform(window)
+        # float32 halves the bytes the reduction streams through vs float64
+        data = src.read(window=window, masked=True, out_dtype='float32').filled(np.nan)
+    print(f"Read {data.shape[0]} bands from {nc_file}")
+
+    # Step 2: Mask to LA borders (True outside the boundary)
+    outside = get_la_mask(data.shape[1:], transform)
+
+    # Step 3: Daily MAX NO2 across all bands, clipped and scaled 0-5e17 -> 1-255
     print("Calculating daily NO2...")
-    with rasterio.open(temp_all_bands) as src:
-        data = src.read()
-        daily_max = np.nanmax(data, axis=0)
-        profile = src.profile.copy()
-        profile.update({
-            'count': 1,
-            'dtype': 'float64',
-            'nodata': 0
-        })
-        
-        with rasterio.open(temp_modified, 'w', **profile) as dst:
-            dst.write(daily_max, 1)
-
-
-    # Step 3: Clip to LA borders
-    subprocess.run([
-        'gdalwarp',
-        '-of', 'GTiff',
-        '-cutline', temp_boundary,
-        '-crop_to_cutline',
-        '-dstnodata', '0',
-        temp_modified,
-        temp_clipped
-    ], check=True)
-
-    # Step 3: Convert to 8-bit COG with scaling
-    subprocess.run([
-        'gdal_translate',
-        '-of', 'COG',
-        '-ot', 'Byte',
-        '-scale', '0', '5e17', '1', '255',
-        '-a_nodata', '0',
-        '-co', 'COMPRESS=DEFLATE',
-        '-co', 'BLOCKSIZE=512',
-        temp_clipped,
-        output_file
-    ], check=True)
-    
-    # Clean up temp file
-    Path(temp_all_bands).unlink()
-    Path(temp_modified).unlink()
-    Path(temp_boundary).unlink()
-    Path(temp_clipped).unlink()
+    scaled = np.empty(data.shape[1:], dtype=np.uint8)
+    daily_max_to_uint8(data, outside, 5e17, scaled)
+
+    # Step 4: Stage the 8-bit raster in memory and copy it out as a COG
+    with MemoryFile() as memfile:
+        with memfile.open(
+            driver='GTiff',
+            dtype='uint8',
+            count=1,
+            height=scaled.shape[0],
+            width=scaled.shape[1],
+            crs='EPSG:4269',
+            transform=transform,
+            nodata=0
+        ) as tmp:
+            tmp.write(scaled, 1)
+        with memfile.open() as src:
+            copy_dataset(src, output_file, driver='COG', compress='DEFLATE', blocksize=512)
         
     print(f"✓ Created 8-bit Louisiana COG: {output_file}")
     
-print('='*60)
-print('Processing TEMPO NetCDF')
-print('='*60)
-print('Initializing...')
-
-# Initialize GCS client
-client = storage.Client(project=GCS_PROJECT_ID) 
-bucket = client.bucket(GCS_BUCKET)
-blobs = bucket.list_blobs(prefix=GCS_BLOB_PREFIX)
-
-pattern = r'tempo_2024-\d{2}-\d{2}.nc' # all 2024 files
-# pattern = r'tempo_2024-01-\d{2}.nc'  # January 2024 files only
-
-processed = 0
-file_count = 0
-for blob in blobs:
-    file_count += 1
-    if file_count <= 5000:        
-        if bool(re.search(pattern, blob.name)):
-            processed += 1
-
-            print('file_count:', file_count)
-            print(f"Processed count: {processed}")
-            print(f'\nProcessing {blob.name}...')
-        
-            with tempfile.NamedTemporaryFile(suffix='.nc', delete=False) as tmp_nc:
-                blob.download_to_filename(tmp_nc.name)
-                with tempfile.NamedTemporaryFile(suffix='.tif', delete=False) as tmp_tif:
-                    try:
-                        # Step 1: Convert to 8-bit COG
-                        convert_tempo_to_8bit_cog(tmp_nc.name, tmp_tif.name)
-                        
-                        # Step 2: Upload to GCS bucket
-                        filename = Path(blob.name).stem.replace('tempo_', '') + '_NO2'
-                        output_blob_name = f'{GCS_BLOB_OUTPUT_PREFIX}{filename}.tif'
-                        output_blob = bucket.blob(output_blob_name)
-                        output_blob.upload_from_filename(tmp_tif.name)
-                        print(f'✓ Uploaded to gs://{GCS_BUCKET}/{output_blob_name}')
-                        
-                        # print(f'\n✓ {date} completed successfully!')
-                        print(f"Processed count: {processed}")
-
-                    except Exception as e:
-                        print(f'✗ Error: {e}')
-                    finally:
-                        Path(tmp_nc.name).unlink()
-                        Path(tmp_tif.name).unlink()
-
-print(f'\nComplete! Processed {processed} files.')
\ No newline at end of file
+bucket = None  # set in each worker by init_worker
+
+# Initialize a GCS client per worker process (clients aren't fork-safe)
+def init_worker():
+    global bucket
+    # The pool already runs one worker per core, so keep Numba's prange serial
+    # instead of starting cpu_count threads in every worker
+    set_num_threads(1)
+    client = storage.Client(project=GCS_PROJECT_ID)
+    bucket = client.bucket(GCS_BUCKET)
+
+# GCS path of the COG produced from a NetCDF blob
+def get_output_blob_name(blob_name):
+    filename = Path(blob_name).stem.replace('tempo_', '') + '_NO2'
+    return f'{GCS_BLOB_OUTPUT_PREFIX}{filename}.tif'
+
+# Download a NetCDF blob to a temp file and convert it from local disk
+def convert_downloaded_blob(blob_name, output_file):
+    with tempfile.NamedTemporaryFile(suffix='.nc', delete=False) as tmp_nc:
+        try:
+            bucket.blob(blob_name).download_to_filename(tmp_nc.name)
+            convert_tempo_to_8bit_cog(tmp_nc.name, output_file)
+        finally:
+            Path(tmp_nc.name).unlink()
+
+# Convert and upload a single NetCDF blob, reading it straight from GCS when possible
+def process_blob(blob_name):
+    print(f'\nProcessing {blob_name}...')
+
+    with tempfile.NamedTemporaryFile(suffix='.tif', delete=False) as tmp_tif:
+        try:
+            # Step 1: Convert to 8-bit COG
+            if READ_FROM_GCS:
+                try:
+                    # GDAL range-reads the NetCDF via /vsigs/
+                    convert_tempo_to_8bit_cog(f'/vsigs/{GCS_BUCKET}/{blob_name}', tmp_tif.name)
+                except RasterioIOError as e:
+                    # netCDF-4 over /vsigs/ needs userfaultfd, which containers often block
+                    print(f'  Could not read {blob_name} from GCS ({e}), downloading it instead')
+                    convert_downloaded_blob(blob_name, tmp_tif.name)
+            else:
+                convert_downloaded_blob(blob_name, tmp_tif.name)
+            
+            # Step 2: Upload to GCS bucket
+            output_blob_name = get_output_blob_name(blob_name)
+            output_blob = bucket.blob(output_blob_name)
+            output_blob.upload_from_filename(tmp_tif.name)
+            print(f'✓ Uploaded to gs://{GCS_BUCKET}/{output_blob_name}')
+            return True
+
+        except Exception as e:
+            print(f'✗ Error processing {blob_name}: {e}')
+            return False
+        finally:
+            Path(tmp_tif.name).unlink()
+
+def main():
+    print('='*60)
+    print('Processing TEMPO NetCDF')
+    print('='*60)
+    print('Initializing...')
+
+    # Preflight: fail before touching GCS if config or the LA boundary is missing
+    if not GCS_PROJECT_ID or not GCS_BUCKET:
+        print('❌ GCS_PROJECT_ID and GCS_BUCKET must be set')
+        return
+    try:
+        load_la_boundary()  # cached to disk, so worker processes just read the file
+    except requests.RequestException as e:
+        print(f'❌ Could not fetch LA boundary: {e}')
+        return
+
+    # Initialize GCS client
+    client = storage.Client(project=GCS_PROJECT_ID) 
+    bucket = client.bucket(GCS_BUCKET)
+
+    # Filter server-side so only matching NetCDFs are listed
+    file_glob = '**/tempo_2024-[0-9][0-9]-[0-9][0-9].nc' # all 2024 files
+    # file_glob = '**/tempo_2024-01-[0-9][0-9].nc'  # January 2024 files only
+
+    blobs = bucket.list_blobs(prefix=GCS_BLOB_PREFIX, match_glob=file_glob)
+    # Re-check names client-side in case the glob is loosened
+    blob_names = [blob.name for blob in blobs if _TEMPO_RE.search(blob.name)]
+    print(f'Found {len(blob_names)} files')
+
+    # Skip files whose COG is already in GCS (one listing instead of a check per file)
+    existing_outputs = {blob.name for blob in bucket.list_blobs(prefix=GCS_BLOB_OUTPUT_PREFIX)}
+    pending = [name for name in blob_names if get_output_blob_name(name) not in existing_outputs]
+    skipped = len(blob_names) - len(pending)
+    blob_names = pending
+    print(f'Skipping {skipped} files with existing output')
+
+    # Files are independent, so run the full pipeline for each one in parallel
+    processed = 0
+    with ProcessPoolExecutor(max_workers=os.cpu_count(), initializer=init_worker) as executor:
+        futures = [executor.submit(process_blob, blob_name) for blob_name in blob_names]
+        for future in as_completed(futures):
+            if future.result():
+                processed += 1
+                print(f"Processed count: {processed}/{len(blob_names)}")
+
+    print(f'\nComplete! Processed {processed} files, skipped {skipped} existing.')
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import netCDF4 as nc
 import rasterio
 import numpy as np
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
 import tempfile
 from pathlib import Path
 import os
@@ -16,6 +17,11 @@ GCS_PREFIX_NC = os.getenv('GCS_BLOB_PREFIX')
 GCS_BUCKET_TIF = 'external_satellite_datasets'
 GCS_PREFIX_TIF = 'visualization_data/no2_daily_files/COG/mapbox/2024/march/'
 
+# Unit conversions: molecules/cm² per ppb, and ppb per 8-bit TIF step
+# (TIF pixels 1-255 map linearly onto 0-5e17 molecules/cm²)
+MOLECULES_PER_PPB = 2.5e16
+TIF_SCALE = np.float32(5e17 / (254 * MOLECULES_PER_PPB))
+
 client = storage.Client(project=GCS_PROJECT_ID)
 
 # Test just one date first
@@ -48,26 +54,36 @@ print(f"TIF: {tif_blob.name}")
 
 # Process NetCDF with detailed output
 with tempfile.NamedTemporaryFile(suffix='.nc', delete=False) as tmp_nc:
-    nc_blob.download_to_filename(tmp_nc.name)
+    # Download the NetCDF in parallel 32MB ranges (threads, since this
+    # script has no __main__ guard for worker processes to re-import)
+    transfer_manager.download_chunks_concurrently(
+        nc_blob, tmp_nc.name, chunk_size=32 * 1024 * 1024, max_workers=8,
+        worker_type=transfer_manager.THREAD
+    )
     
     ds = nc.Dataset(tmp_nc.name)
-    vcd = ds.variables['vertical_column_troposphere'][:]
+    vcd = ds.variables['vertical_column_troposphere']
     
     print(f"\nNetCDF shape: {vcd.shape}")
     print(f"NetCDF bands: {vcd.shape[0]}")
     
-    # Get max across time for each pixel
-    nc_max = np.nanmax(vcd, axis=0)
+    # Get max across time for each pixel, reading one time slice at a time
+    # so only a single (H, W) slice is in memory alongside the running max
+    nc_max = np.full(vcd.shape[1:], np.nan, dtype=np.float32)
+    for t in range(vcd.shape[0]):
+        np.fmax(nc_max, np.ma.filled(vcd[t, :, :], np.nan).astype(np.float32, copy=False), out=nc_max)
     
     print(f"After nanmax shape: {nc_max.shape}")
     
+    # Only the summary stats need converting to ppb
     nc_valid = nc_max[nc_max > 0]
-    nc_molecules = nc_valid
-    nc_ppb = nc_molecules / 2.5e16
+    nc_max_molecules = np.nanmax(nc_valid)
+    nc_max_ppb = nc_max_molecules / MOLECULES_PER_PPB
+    nc_mean_ppb = np.nanmean(nc_valid) / MOLECULES_PER_PPB
     
-    print(f"\nNetCDF raw max: {np.nanmax(nc_molecules):.2e} molecules/cm²")
-    print(f"NetCDF max ppb: {np.nanmax(nc_ppb):.2f} ppb")
-    print(f"NetCDF mean ppb: {np.nanmean(nc_ppb):.2f} ppb")
+    print(f"\nNetCDF raw max: {nc_max_molecules:.2e} molecules/cm²")
+    print(f"NetCDF max ppb: {nc_max_ppb:.2f} ppb")
+    print(f"NetCDF mean ppb: {nc_mean_ppb:.2f} ppb")
     
     ds.close()
     Path(tmp_nc.name).unlink()
@@ -81,20 +97,21 @@ with tempfile.NamedTemporaryFile(suffix='.tif', delete=False) as tmp_tif:
         print(f"\nTIF shape: {tif_data.shape}")
         print(f"TIF pixel range: {np.min(tif_data)} - {np.max(tif_data)}")
     
-    tif_valid = tif_data[(tif_data > 0) & (tif_data < 256)]
+    tif_valid = tif_data[tif_data > 0]
     print(f"TIF valid pixels: {len(tif_valid)}")
     print(f"TIF valid pixel range: {np.min(tif_valid)} - {np.max(tif_valid)}")
     
-    # Convert back to molecules/cm²
-    tif_molecules = ((tif_valid - 1) / 254) * 5e17
-    tif_ppb = tif_molecules / 2.5e16
+    # Convert back to ppb. The scaling is linear, so convert the stats
+    # computed on the 8-bit pixels rather than every pixel
+    tif_max_ppb = (np.max(tif_valid) - 1) * TIF_SCALE
+    tif_mean_ppb = (np.mean(tif_valid) - 1) * TIF_SCALE
     
-    print(f"\nTIF raw max: {np.max(tif_molecules):.2e} molecules/cm²")
-    print(f"TIF max ppb: {np.max(tif_ppb):.2f} ppb")
-    print(f"TIF mean ppb: {np.mean(tif_ppb):.2f} ppb")
+    print(f"\nTIF raw max: {tif_max_ppb * MOLECULES_PER_PPB:.2e} molecules/cm²")
+    print(f"TIF max ppb: {tif_max_ppb:.2f} ppb")
+    print(f"TIF mean ppb: {tif_mean_ppb:.2f} ppb")
     
     Path(tmp_tif.name).unlink()
 
 print(f"\n{'='*60}")
-print(f"DIFFERENCE: {abs(np.nanmax(nc_ppb) - np.max(tif_ppb)):.2f} ppb")
-print(f"DIFFERENCE %: {abs(np.nanmax(nc_ppb) - np.max(tif_ppb)) / np.nanmax(nc_ppb) * 100:.1f}%")
\ No newline at end of file
+print(f"DIFFERENCE: {abs(nc_max_ppb - tif_max_ppb):.2f} ppb")
+print(f"DIFFERENCE %: {abs(nc_max_ppb - tif_max_ppb) / nc_max_ppb * 100:.1f}%")
\ No newline at end of file
@@ -1,6 +1,9 @@
 from google.cloud import storage
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_toolbelt import MultipartEncoder
 import re
 from dotenv import load_dotenv
 import os
@@ -19,51 +22,102 @@ GCS_BUCKET = os.getenv('GCS_BUCKET')
 GCS_BLOB_PREFIX = os.getenv('GCS_BLOB_PREFIX')
 GCS_BLOB_OUTPUT_PREFIX = os.getenv('GCS_BLOB_OUTPUT_PREFIX') + '2/'
 
-LA_BOUNDARY_URL = "https://tigerweb.geo.census.gov/arcgis/rest/services/TIGERweb/State_County/MapServer/0/query?where=NAME='Louisiana'&outFields=*&outSR=4326&f=geojson"
-LA_BOUNDARY = requests.get(LA_BOUNDARY_URL).json()
+RETRY_STATUSES = [429, 500, 502, 503, 504]
 
+# Shared Mapbox session: keeps TLS connections alive between calls and retries
+# idempotent requests (GETs) on rate limits (429) and server errors with exponential
+# backoff. POSTs aren't retried here; a repeated POST could append a source file
+# twice or queue a duplicate publish job, so they go through post_with_backoff.
+_mapbox_session = requests.Session()
+_mapbox_session.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=5,
+        backoff_factor=2,
+        status_forcelist=RETRY_STATUSES,
+        raise_on_status=False  # hand back the last response instead of raising
+    )
+))
+
+# POST, retrying only on rate limits (429), which Mapbox rejects before acting
 def post_with_backoff(url, **kwargs):
     for attempt in range(5):
-        r = requests.post(url, **kwargs)
-        if r.status_code != 429:
-            return r
-        # wait and retry after hitting rate limit
-        sleep_seconds = 4 ** attempt # 2, 4, 8, 16, 32 seconds
+        response = _mapbox_session.post(url, **kwargs)
+        if response.status_code != 429 or attempt == 4:
+            return response
+        sleep_seconds = 2 ** (attempt + 1) # 2, 4, 8, 16 seconds
         print(f"  Rate limited (429). Retrying in {sleep_seconds} seconds...")
-        time.sleep(sleep_seconds)  
-    return r  # last response
+        time.sleep(sleep_seconds)
 
-# Check if tileset already exists
-def tileset_exists(tileset_id):
-    url = f"https://api.mapbox.com/tilesets/v1/{MAPBOX_USERNAME}.{tileset_id}"
-    response = requests.get(url, params={"access_token": MAPBOX_TOKEN}, timeout=30)
+# Uploads stream their body, so they get a session without automatic retries
+_mapbox_upload_session = requests.Session()
+
+# List the IDs of every tileset on the account (one request per 500 tilesets)
+def list_existing_tilesets():
+    url = f"https://api.mapbox.com/tilesets/v1/{MAPBOX_USERNAME}"
+    params = {"access_token": MAPBOX_TOKEN, "limit": 500}
+    existing = set()
     
-    if response.status_code == 200:
-        return True
-    elif response.status_code == 404:
-        return False
-    else:
-        print(f"  Warning: Could not check tileset status: {response.status_code}")
-        return False
+    while url:
+        response = _mapbox_session.get(url, params=params, timeout=30)
+        if response.status_code != 200:
+            print(f"  Warning: Could not list tilesets: {response.status_code}")
+            break
+        existing.update(tileset['id'].split('.', 1)[-1] for tileset in response.json())
+        
+        # Further pages are linked from the response headers
+        url = response.links.get('next', {}).get('url')
+        params = None if url and 'access_token=' in url else {"access_token": MAPBOX_TOKEN}
+    
+    return existing
+
+_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
 
 # Extract date from filename
 def extract_date(filename):
-    match = re.search(r'(\d{4}-\d{2}-\d{2})', filename)
+    match = _DATE_RE.search(filename)
     if not match:
         print(f'✗ Could not extract date from {filename}')
     return match.group(1) if match else None
 \
+# Blob reader that reports how many bytes are left to read. MultipartEncoder needs
+# that length, and GCS's BlobReader has no __len__ or usable fileno() to get it from.
+class SizedBlobReader:
+    def __init__(self, reader, size):
+        self.reader = reader
+        self.size = size
+
+    @property
+    def len(self):
+        return self.size - self.reader.tell()
+
+    def read(self, size=-1):
+        return self.reader.read(size)
+
 # Upload COG to Mapbox tileset source
 def upload_to_mapbox_source_from_gcs(blob, source_id):
-    """Upload directly from GCS blob to Mapbox"""
+    """Stream directly from GCS blob to Mapbox"""
     print(f"  Uploading to Mapbox source...")
     url = f"https://api.mapbox.com/tilesets/v1/sources/{MAPBOX_USERNAME}/{source_id}?access_token={MAPBOX_TOKEN}"
     
-    # Stream blob content directly
-    file_content = blob.download_as_bytes()
-    
-    files = {'file': ('file.tif', file_content, 'image/tiff')}
-    response = post_with_backoff(url, files=files, timeout=300)
+    # A streamed body can't be replayed by the session's retry adapter,
+    # so reopen the blob and retry by hand
+    for attempt in range(5):
+        with blob.open('rb', chunk_size=4 * 1024 * 1024) as src:
+            body = SizedBlobReader(src, blob.size)  # size comes with the blob listing
+            encoder = MultipartEncoder(fields={'file': ('file.tif', body, 'image/tiff')})
+            response = _mapbox_upload_session.post(
+                url,
+                data=encoder,
+                headers={'Content-Type': encoder.content_type},
+                timeout=300
+            )
+        if response.status_code != 429 or attempt == 4:
+            break
+        sleep_seconds = 2 ** (attempt + 1) # 2, 4, 8, 16 seconds
+        print(f"  Rate limited (429). Retrying in {sleep_seconds} seconds...")
+        time.sleep(sleep_seconds)
     
     if response.status_code == 200:
         print(f"  ✓ Uploaded to Mapbox source")
@@ -147,6 +201,9 @@ client = storage.Client(project=GCS_PROJECT_ID)
 bucket = client.bucket(GCS_BUCKET)
 blobs = bucket.list_blobs(prefix=GCS_BLOB_OUTPUT_PREFIX)
 
+existing_tilesets = list_existing_tilesets()
+print(f'Found {len(existing_tilesets)} existing tilesets')
+
 file_count = 0
 processed = 0
 skipped = 0
@@ -172,7 +229,7 @@ for blob in blobs:
         continue
 
     # Check if tileset already exists
-    if tileset_exists(mapbox_id):
+    if mapbox_id in existing_tilesets:
         print(f"Tileset {mapbox_id} already exists, skipping...")
         skipped += 1
         continue
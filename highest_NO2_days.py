@@ -89,10 +89,11 @@
 # print(f"\nTotal days analyzed: {len(daily_results)}")
 # print(f"Total days over 100 ppb: {len(over_100_days)}")
 
-import netCDF4 as nc
+import xarray as xr
 import rasterio
 import numpy as np
 from google.cloud import storage
+from google.cloud.storage import transfer_manager
 import tempfile
 from pathlib import Path
 import os
@@ -107,6 +108,11 @@ GCS_PREFIX_NC = os.getenv('GCS_BLOB_PREFIX')
 GCS_BUCKET_TIF = 'external_satellite_datasets'
 GCS_PREFIX_TIF = 'visualization_data/no2_daily_files/COG/mapbox/2024/'
 
+# Unit conversions: molecules/cm² per ppb, and ppb per 8-bit TIF step
+# (TIF pixels 1-255 map linearly onto 0-5e17 molecules/cm²)
+MOLECULES_PER_PPB = 2.5e16
+TIF_SCALE = np.float32(5e17 / (254 * MOLECULES_PER_PPB))
+
 client = storage.Client(project=GCS_PROJECT_ID)
 
 # Get all January 2024 files
@@ -150,18 +156,24 @@ for date in common_dates:
     
     # Process NetCDF
     with tempfile.NamedTemporaryFile(suffix='.nc', delete=False) as tmp_nc:
-        nc_blob.download_to_filename(tmp_nc.name)
+        # Download the NetCDF in parallel 32MB ranges (threads, since this
+        # script has no __main__ guard for worker processes to re-import)
+        transfer_manager.download_chunks_concurrently(
+            nc_blob, tmp_nc.name, chunk_size=32 * 1024 * 1024, max_workers=8,
+            worker_type=transfer_manager.THREAD
+        )
         
-        ds = nc.Dataset(tmp_nc.name)
-        vcd = ds.variables['vertical_column_troposphere'][:]
-        nc_max = np.nanmax(vcd, axis=0)
+        # Max across time with dask: streams the file's on-disk chunks and
+        # reduces them across threads, so the full cube never sits in memory
+        with xr.open_dataset(tmp_nc.name, engine='h5netcdf', chunks={}) as ds:
+            vcd = ds['vertical_column_troposphere'].astype(np.float32)
+            nc_max = vcd.max(dim=vcd.dims[0], skipna=True).values
         nc_valid = nc_max[nc_max > 0]
-        nc_ppb = nc_valid / 2.5e16
         
-        nc_max_ppb = np.nanmax(nc_ppb)
-        nc_mean_ppb = np.nanmean(nc_ppb)
+        # Only the summary stats need converting to ppb
+        nc_max_ppb = np.nanmax(nc_valid) / MOLECULES_PER_PPB
+        nc_mean_ppb = np.nanmean(nc_valid) / MOLECULES_PER_PPB
         
-        ds.close()
         Path(tmp_nc.name).unlink()
     
     # Process TIF
@@ -171,12 +183,11 @@ for date in common_dates:
         with rasterio.open(tmp_tif.name) as src:
             tif_data = src.read(1)
         
-        tif_valid = tif_data[(tif_data > 0) & (tif_data < 256)]
-        tif_molecules = ((tif_valid - 1) / 254) * 5e17
-        tif_ppb = tif_molecules / 2.5e16
+        tif_valid = tif_data[tif_data > 0]
         
-        tif_max_ppb = np.max(tif_ppb)
-        tif_mean_ppb = np.mean(tif_ppb)
+        # The 8-bit scaling is linear, so convert the stats rather than every pixel
+        tif_max_ppb = (np.max(tif_valid) - 1) * TIF_SCALE
+        tif_mean_ppb = (np.mean(tif_valid) - 1) * TIF_SCALE
         
         Path(tmp_tif.name).unlink()
     
@@ -1,15 +1,27 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from requests_toolbelt import MultipartEncoder
 import os
+import atexit
 import json
 import time
-import subprocess
-import tempfile
 import re
+import shutil
+import tempfile
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
 from google.cloud import storage
+from osgeo import gdal, osr
 from dotenv import load_dotenv
+import numpy as np
 
 load_dotenv()
+gdal.UseExceptions()
 
 # Configuration
 MAPBOX_TOKEN = os.getenv('MAPBOX_TOKEN')
@@ -25,79 +37,198 @@ TILESET_NAME = "TEMPO NO2 September 1-5 2023"
 
 # File pattern to match (adjust as needed)
 FILE_PATTERN = r'tempo_2024-01-0[1-23].nc'  # January 1-5 only
+FILE_GLOB = '**/tempo_2024-01-0[1-3].nc'  # Same files, matched server-side by GCS
 MAX_FILES = 5  # Limit to 5 files
+_FILE_RE = re.compile(FILE_PATTERN)
+_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+GCS_MAX_WORKERS = 8  # Parallel GCS downloads
+MAX_PENDING_FILES = 8  # Downloaded NC files allowed to wait for conversion
+MAPBOX_UPLOAD_WORKERS = 4  # Concurrent uploads to the tileset source
+CONVERT_WORKERS = min(os.cpu_count(), MAX_FILES)  # Parallel NC -> COG conversions (one process each)
+GDAL_THREADS = max(1, os.cpu_count() // CONVERT_WORKERS)  # Cores left to each conversion's warp and COG write
+READ_FROM_GCS = True  # Read NC files in place via GDAL's /vsigs/, downloading any it can't open
+# Downloaded NC files, kept across runs and keyed by blob name. Used when READ_FROM_GCS
+# is False, or for files /vsigs/ couldn't convert; in-place reads never write NC files locally.
+NC_CACHE_DIR = Path('/tmp/tempo_cache')
+NC_CACHE_MAX_BYTES = 10 * 1024**3  # Least recently used files are evicted beyond this
+SCRATCH_MIN_FREE = 2 * 1024**3  # Free bytes /dev/shm needs before it's used for intermediates
+
+# GDAL settings for reading NC files directly from GCS over /vsigs/
+os.environ.setdefault('GDAL_HTTP_MULTIPLEX', 'YES')
+os.environ.setdefault('CPL_VSIL_CURL_ALLOWED_EXTENSIONS', '.nc')
+os.environ.setdefault('CPL_VSIL_CURL_CHUNK_SIZE', str(10 * 1024 * 1024))  # GDAL's maximum
+os.environ.setdefault('CPL_VSIL_CURL_CACHE_SIZE', str(200 * 1000 * 1000))
+
+# Shared Mapbox session for every API call, so they reuse keep-alive connections
+MAPBOX_SESSION = requests.Session()
+MAPBOX_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=8,
+    pool_maxsize=8,
+    # Retries idempotent requests (GETs) on transient server errors
+    max_retries=Retry(
+        total=5,
+        backoff_factor=1,
+        status_forcelist=[500, 502, 503, 504],
+        raise_on_status=False  # hand back the last response for the caller to report
+    )
+))
+atexit.register(MAPBOX_SESSION.close)
 
 # Louisiana boundary for clipping
 LA_BOUNDARY_URL = "https://tigerweb.geo.census.gov/arcgis/rest/services/TIGERweb/State_County/MapServer/0/query?where=NAME='Louisiana'&outFields=*&outSR=4326&f=geojson"
-LA_BOUNDARY = requests.get(LA_BOUNDARY_URL).json()
+LA_BOUNDARY_PATH = Path('/tmp/la_boundary.geojson')
 LA_BOUNDS = [-94.043, 28.925, -88.817, 33.019]
 
+@lru_cache(maxsize=None)
+def get_la_boundary_path():
+    """Path to the LA boundary GeoJSON, fetched once and reused across runs"""
+    if not LA_BOUNDARY_PATH.exists():
+        response = requests.get(LA_BOUNDARY_URL, timeout=10)
+        response.raise_for_status()
+        # Write then rename so parallel converters never read a partial file
+        tmp_path = LA_BOUNDARY_PATH.with_suffix(f'.{os.getpid()}.tmp')
+        tmp_path.write_text(response.text)
+        os.replace(tmp_path, LA_BOUNDARY_PATH)
+    return str(LA_BOUNDARY_PATH)
+
+def get_scratch_dir():
+    """RAM-backed /dev/shm for intermediate files when it has room, else the default temp dir"""
+    shm = Path('/dev/shm')
+    if shm.is_dir() and shutil.disk_usage(shm).free >= SCRATCH_MIN_FREE:
+        return str(shm)
+    return None  # tempfile falls back to TMPDIR / /tmp
+
 def convert_tempo_to_8bit_cog(nc_file, output_file):
     """Convert TEMPO NetCDF to 8-bit COG with Louisiana clipping"""
-    temp_all_bands = output_file.replace('.tif', '_allbands.tif')
-    temp_modified = output_file.replace('.tif', '_modified.tif')
-    temp_clipped = output_file.replace('.tif', '_clipped.tif')
-    temp_boundary = output_file.replace('.tif', '_boundary.geojson')
-    
-    with open(temp_boundary, 'w') as f:
-        json.dump(LA_BOUNDARY, f)
-
     netcdf_path = f'NETCDF:"{nc_file}":vertical_column_troposphere'
 
-    # Step 1: Extract ALL bands
-    subprocess.run([
-        'gdal_translate',
-        '-of', 'GTiff',
-        # '-b', '1',
-        '-projwin', str(LA_BOUNDS[0]), str(LA_BOUNDS[3]), str(LA_BOUNDS[2]), str(LA_BOUNDS[1]),
-        '-a_srs', 'EPSG:4269',
-        netcdf_path,
-        temp_all_bands
-    ], check=True)
+    # Every step runs in-process on in-memory (MEM) datasets; only the COG hits disk
+
+    # Step 1: Locate the LA bounding box in the NetCDF grid
+    src = gdal.Open(netcdf_path)
+    x0, dx, _, y0, _, dy = src.GetGeoTransform()
+    xoff = max(int(round((LA_BOUNDS[0] - x0) / dx)), 0)
+    yoff = max(int(round((LA_BOUNDS[3] - y0) / dy)), 0)
+    xsize = min(int(round((LA_BOUNDS[2] - x0) / dx)), src.RasterXSize) - xoff
+    ysize = min(int(round((LA_BOUNDS[1] - y0) / dy)), src.RasterYSize) - yoff
 
-    # Step 2: Calculate daily MAX NO2 across all bands
-    subprocess.run([
-        'gdal_calc.py',
-        '--calc', 'numpy.nanmax(A, axis=0)',
-        '--allBands', 'A',
-        '-A', temp_all_bands,
-        '--outfile', temp_modified,
-        '--NoDataValue=0',
-        '--format', 'GTiff',
-        '--type', 'Float32'
-    ], check=True)
+    # Step 2: Calculate daily MAX NO2, folding one band at a time into a
+    # running float32 max so the full band stack is never held in memory
+    daily_max = np.full((ysize, xsize), np.nan, dtype=np.float32)
+    for i in range(1, src.RasterCount + 1):
+        band = src.GetRasterBand(i)
+        band_arr = band.ReadAsArray(xoff, yoff, xsize, ysize).astype(np.float32, copy=False)
+        fill_value = band.GetNoDataValue()
+        if fill_value is not None:
+            band_arr[band_arr == fill_value] = np.nan
+        np.fmax(daily_max, band_arr, out=daily_max)  # ignores NaNs like nanmax
+    daily_max[np.isnan(daily_max)] = 0
+
+    la_srs = osr.SpatialReference()
+    la_srs.ImportFromEPSG(4269)
+    la_srs.SetAxisMappingStrategy(osr.OAMS_TRADITIONAL_GIS_ORDER)  # lon, lat axis order
+    maxed = gdal.GetDriverByName('MEM').Create('', xsize, ysize, 1, gdal.GDT_Float32)
+    maxed.SetGeoTransform((x0 + xoff * dx, dx, 0, y0 + yoff * dy, 0, dy))
+    maxed.SetSpatialRef(la_srs)
+    maxed.GetRasterBand(1).SetNoDataValue(0)
+    maxed.GetRasterBand(1).WriteArray(daily_max)
+    src = None
 
     # Step 3: Clip to LA borders
-    subprocess.run([
-        'gdalwarp',
-        '-of', 'GTiff',
-        '-cutline', temp_boundary,
-        '-crop_to_cutline',
-        '-dstnodata', '0',
-        temp_modified,
-        temp_clipped
-    ], check=True)
+    clipped = gdal.Warp(
+        '', maxed,
+        format='MEM',
+        cutlineDSName=get_la_boundary_path(),
+        cropToCutline=True,
+        dstNodata=0,
+        multithread=True,
+        warpOptions=[f'NUM_THREADS={GDAL_THREADS}']
+    )
+
+    # Step 4: Convert to 8-bit COG with scaling (the returned dataset isn't kept,
+    # so it is closed and flushed to disk as soon as the call returns)
+    gdal.Translate(
+        output_file, clipped,
+        format='COG',
+        outputType=gdal.GDT_Byte,
+        scaleParams=[[0, 5e17, 1, 255]],
+        noData=0,
+        creationOptions=[
+            'COMPRESS=ZSTD',
+            'LEVEL=9',
+            'PREDICTOR=YES',  # horizontal differencing (2) for Byte data
+            'BLOCKSIZE=256',  # one block per tile at the recipe's tilesize
+            f'NUM_THREADS={GDAL_THREADS}',
+            # Internal overviews come from the driver's default OVERVIEWS=AUTO
+            'OVERVIEW_COMPRESS=ZSTD',
+            'OVERVIEW_RESAMPLING=NEAREST'
+        ]
+    )
 
-    # Step 4: Convert to 8-bit COG with scaling
-    subprocess.run([
-        'gdal_translate',
-        '-of', 'COG',
-        '-ot', 'Byte',
-        '-b', '1',  # Explicitly select only band 1
-        '-scale', '0', '5e17', '1', '255',
-        '-a_nodata', '0',
-        '-co', 'COMPRESS=DEFLATE',
-        '-co', 'BLOCKSIZE=512',
-        temp_clipped,
-        output_file
-    ], check=True)
+def trim_nc_cache(blobs):
+    """Evict least recently used cached NC files so this run's blobs fit in NC_CACHE_MAX_BYTES"""
+    keep = {NC_CACHE_DIR / blob.name for blob in blobs}
+    others = [p for p in NC_CACHE_DIR.rglob('*.nc') if p not in keep]
+    others.sort(key=lambda p: p.stat().st_mtime)  # oldest first
+    total = sum(p.stat().st_size for p in others) + sum(blob.size or 0 for blob in blobs)
+    for path in others:
+        if total <= NC_CACHE_MAX_BYTES:
+            break
+        total -= path.stat().st_size
+        path.unlink()
+        path.with_name(path.name + '.md5').unlink(missing_ok=True)
+
+def download_for_conversion(blobs, dates, convert_pool, workdir):
+    """Download NC files and queue each one for conversion as soon as it lands"""
+    # Downloads run on a thread pool (I/O-bound) and each finished file goes
+    # straight to the converter process pool, so network and GDAL work overlap.
+    # The semaphore caps how many downloaded files can wait for a converter.
+    pending = threading.BoundedSemaphore(MAX_PENDING_FILES)
+    
+    def download(blob, nc_path):
+        """Fetch the blob unless the cached copy's MD5 matches; returns True if downloaded"""
+        pending.acquire()
+        # md5_hash comes with the list response, so checking it costs no extra request
+        md5_path = nc_path.with_name(nc_path.name + '.md5')
+        if nc_path.exists() and md5_path.exists() and md5_path.read_text() == blob.md5_hash:
+            nc_path.touch()  # mark as recently used for eviction
+            return False
+        md5_path.unlink(missing_ok=True)  # a stale sidecar must not vouch for a partial file
+        nc_path.parent.mkdir(parents=True, exist_ok=True)
+        blob.download_to_filename(str(nc_path))
+        if blob.md5_hash:
+            md5_path.write_text(blob.md5_hash)
+        return True
+    
+    trim_nc_cache(blobs)
+    convert_futures = {}
+    
+    with ThreadPoolExecutor(max_workers=GCS_MAX_WORKERS) as download_pool:
+        download_futures = {}
+        for blob, date in zip(blobs, dates):
+            nc_path = NC_CACHE_DIR / blob.name
+            future = download_pool.submit(download, blob, nc_path)
+            download_futures[future] = (blob, date, nc_path)
+        
+        for future in as_completed(download_futures):
+            blob, date, nc_path = download_futures[future]
+            try:
+                downloaded = future.result()
+            except Exception as e:
+                print(f"❌ Download failed for {blob.name}: {e}")
+                nc_path.unlink(missing_ok=True)
+                pending.release()
+                continue
+            
+            print(f"✓ {'Downloaded' if downloaded else 'Using cached'} {blob.name}")
+            tif_path = f"{workdir}/tempo_{date}.tif"
+            future = convert_pool.submit(convert_tempo_to_8bit_cog, str(nc_path), tif_path)
+            future.add_done_callback(lambda _: pending.release())
+            convert_futures[future] = tif_path
     
-    # Clean up temp files
-    for temp_file in [temp_all_bands, temp_modified, temp_boundary, temp_clipped]:
-        if Path(temp_file).exists():
-            Path(temp_file).unlink()
+    return convert_futures
 
-def download_and_convert_nc_files():
+def download_and_convert_nc_files(workdir):
     """Step 1: Download NC files from GCS and convert to TIF"""
     print(f"\n{'='*60}")
     print("STEP 1: Downloading and converting NC files to TIF")
@@ -106,42 +237,66 @@ def download_and_convert_nc_files():
     # Initialize GCS client
     client = storage.Client(project=GCS_PROJECT_ID)
     bucket = client.bucket(GCS_BUCKET)
-    blobs = bucket.list_blobs(prefix=GCS_BLOB_PREFIX)
+    blobs = bucket.list_blobs(prefix=GCS_BLOB_PREFIX, match_glob=FILE_GLOB, max_results=MAX_FILES)
+    
+    # Pick the files first so their work can start together
+    # (GCS already filtered by FILE_GLOB; the regex is a defensive re-check)
+    matching = (blob for blob in blobs if _FILE_RE.search(blob.name))
+    selected = list(itertools.islice(matching, MAX_FILES))
+    if len(selected) == MAX_FILES:
+        print(f"\nReached max files limit ({MAX_FILES})")
+    
+    dates = []
+    for i, blob in enumerate(selected, start=1):
+        date_match = _DATE_RE.search(blob.name)
+        dates.append(date_match.group(1) if date_match else f"file_{i}")
     
     tif_files = []
-    processed = 0
     
-    for blob in blobs:
-        if not re.search(FILE_PATTERN, blob.name):
-            continue
-            
-        if processed >= MAX_FILES:
-            print(f"\nReached max files limit ({MAX_FILES})")
-            break
-        
-        processed += 1
-        print(f"\n[{processed}/{MAX_FILES}] Processing {blob.name}...")
-        
-        # Download NC file
-        with tempfile.NamedTemporaryFile(suffix='.nc', delete=False) as tmp_nc:
-            blob.download_to_filename(tmp_nc.name)
+    # Spawned (not forked) workers, since the download threads may be mid-request
+    # when the first conversion is submitted and forking would copy their HTTP/SSL state
+    spawn = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=CONVERT_WORKERS, mp_context=spawn) as convert_pool:
+        if READ_FROM_GCS:
+            # GDAL range-reads each NetCDF straight from GCS, so nothing is downloaded
+            vsigs_futures = {}
+            for blob, date in zip(selected, dates):
+                tif_path = f"{workdir}/tempo_{date}.tif"
+                future = convert_pool.submit(
+                    convert_tempo_to_8bit_cog, f'/vsigs/{GCS_BUCKET}/{blob.name}', tif_path
+                )
+                vsigs_futures[future] = (blob, date, tif_path)
             
-            # Convert to TIF
-            date_match = re.search(r'(\d{4}-\d{2}-\d{2})', blob.name)
-            date = date_match.group(1) if date_match else f"file_{processed}"
-            
-            tif_path = f"/tmp/tempo_{date}.tif"
+            # netCDF-4 over /vsigs/ needs userfaultfd, which containers often block,
+            # so files that fail here are downloaded and converted from local disk
+            fallback_blobs, fallback_dates = [], []
+            for future in as_completed(vsigs_futures):
+                blob, date, tif_path = vsigs_futures[future]
+                try:
+                    future.result()
+                    tif_files.append(tif_path)
+                    print(f"✓ Converted to {tif_path}")
+                except Exception as e:
+                    print(f"  Could not convert {blob.name} from GCS ({e}), downloading it instead")
+                    fallback_blobs.append(blob)
+                    fallback_dates.append(date)
             
+            convert_futures = {}
+            if fallback_blobs:
+                convert_futures = download_for_conversion(fallback_blobs, fallback_dates, convert_pool, workdir)
+        else:
+            convert_futures = download_for_conversion(selected, dates, convert_pool, workdir)
+        
+        for future in as_completed(convert_futures):
+            tif_path = convert_futures[future]
             try:
-                convert_tempo_to_8bit_cog(tmp_nc.name, tif_path)
+                future.result()
                 tif_files.append(tif_path)
                 print(f"✓ Converted to {tif_path}")
             except Exception as e:
-                print(f"❌ Conversion failed: {e}")
-            finally:
-                Path(tmp_nc.name).unlink()
+                print(f"❌ Conversion failed for {tif_path}: {e}")
     
-    return tif_files
+    return sorted(tif_files)
 
 def upload_source_files(tif_files):
     """Step 2: Upload all TIF files to create a tileset source"""
@@ -151,25 +306,52 @@ def upload_source_files(tif_files):
     
     url = f"https://api.mapbox.com/tilesets/v1/sources/{MAPBOX_USERNAME}/{SOURCE_NAME}"
     
-    for i, tif_file in enumerate(tif_files):
+    def upload_one(i, tif_file):
+        name = Path(tif_file).name
         if not os.path.exists(tif_file):
             print(f"❌ File not found: {tif_file}")
-            continue
+            return True
             
-        print(f"\n[{i+1}/{len(tif_files)}] Uploading {Path(tif_file).name}...")
+        print(f"\n[{i+1}/{len(tif_files)}] Uploading {name}...")
         
-        with open(tif_file, 'rb') as f:
-            files = {'file': (Path(tif_file).name, f, 'image/tiff')}
-            params = {'access_token': MAPBOX_TOKEN}
-            response = requests.post(url, files=files, params=params)
+        for attempt in range(5):
+            # Stream the multipart body from disk instead of building it in memory
+            with open(tif_file, 'rb') as f:
+                encoder = MultipartEncoder(fields={'file': (name, f, 'image/tiff')})
+                params = {'access_token': MAPBOX_TOKEN}
+                response = MAPBOX_SESSION.post(
+                    url,
+                    data=encoder,
+                    headers={'Content-Type': encoder.content_type},
+                    params=params
+                )
+            
+            if response.status_code != 429 or attempt == 4:
+                break  # done, or out of retries (no point waiting after the last one)
+            
+            # Rate limited: wait as long as Mapbox asks before retrying
+            try:
+                wait = float(response.headers.get('Retry-After', ''))
+            except ValueError:
+                wait = 2 ** (attempt + 1)
+            print(f"  Rate limited on {name}, retrying in {wait:.0f} seconds...")
+            time.sleep(wait)
         
         if response.status_code in [200, 201]:
-            print(f"✓ Uploaded successfully")
+            print(f"✓ Uploaded {name}")
+            return True
         else:
-            print(f"❌ Upload failed: {response.status_code}")
+            print(f"❌ Upload of {name} failed: {response.status_code}")
             print(response.text)
             return False
     
+    # A few uploads at a time, sharing the session's connection pool
+    with ThreadPoolExecutor(max_workers=MAPBOX_UPLOAD_WORKERS) as pool:
+        results = list(pool.map(upload_one, range(len(tif_files)), tif_files))
+    
+    if not all(results):
+        return False
+    
     print(f"\n✓ All files uploaded to source: {SOURCE_NAME}")
     return True
 
@@ -215,7 +397,7 @@ def create_tileset(recipe):
         "name": TILESET_NAME
     }
     
-    response = requests.post(url, json=data, params={'access_token': MAPBOX_TOKEN})
+    response = MAPBOX_SESSION.post(url, json=data, params={'access_token': MAPBOX_TOKEN})
     
     if response.status_code in [200, 201]:
         print(f"✓ Tileset created: {TILESET_ID}")
@@ -232,7 +414,7 @@ def publish_tileset():
     print(f"{'='*60}")
     
     url = f"https://api.mapbox.com/tilesets/v1/{TILESET_ID}/publish"
-    response = requests.post(url, params={'access_token': MAPBOX_TOKEN})
+    response = MAPBOX_SESSION.post(url, params={'access_token': MAPBOX_TOKEN})
     
     if response.status_code in [200, 201]:
         job = response.json()
@@ -253,8 +435,13 @@ def check_job_status(job_id):
     
     url = f"https://api.mapbox.com/tilesets/v1/{TILESET_ID}/jobs/{job_id}"
     
+    # Poll quickly at first, then back off exponentially for long jobs
+    delay = 2
+    max_delay = 60
+    last_stage = None
+    
     while True:
-        response = requests.get(url, params={'access_token': MAPBOX_TOKEN})
+        response = MAPBOX_SESSION.get(url, params={'access_token': MAPBOX_TOKEN})
         
         if response.status_code == 200:
             job = response.json()
@@ -262,6 +449,11 @@ def check_job_status(job_id):
             
             print(f"Status: {stage}")
             
+            # A new stage means progress, so start polling quickly again
+            if stage != last_stage:
+                delay = 2
+                last_stage = stage
+            
             if stage == 'success':
                 print(f"\n✓ Tileset published successfully!")
                 print(f"  View at: https://studio.mapbox.com/tilesets/{TILESET_ID}/")
@@ -271,8 +463,9 @@ def check_job_status(job_id):
                 print(json.dumps(job, indent=2))
                 break
             else:
-                print(f"  Still processing... (waiting 10 seconds)")
-                time.sleep(10)
+                print(f"  Still processing... (waiting {delay} seconds)")
+                time.sleep(delay)
+                delay = min(delay * 2, max_delay)
         else:
             print(f"❌ Failed to check status: {response.status_code}")
             break
@@ -298,44 +491,39 @@ def main():
         print("❌ GCS_PROJECT_ID not set")
         return
     
-    # Execute workflow
-    tif_files = download_and_convert_nc_files()
-    
-    if not tif_files:
-        print("\n❌ No TIF files created")
+    # Fetch the LA boundary up front so a network problem aborts before any GCS work
+    try:
+        get_la_boundary_path()
+    except requests.RequestException as e:
+        print(f"❌ Could not fetch LA boundary: {e}")
         return
     
-    print(f"\n✓ Created {len(tif_files)} TIF files")
-    
-    if not upload_source_files(tif_files):
-        print("\n❌ Workflow stopped due to upload errors")
-        # Cleanup temp files
-        for f in tif_files:
-            if Path(f).exists():
-                Path(f).unlink()
-        return
-    
-    recipe = create_recipe()
-    
-    if not create_tileset(recipe):
-        print("\n❌ Workflow stopped due to tileset creation error")
-        # Cleanup temp files
-        for f in tif_files:
-            if Path(f).exists():
-                Path(f).unlink()
-        return
-    
-    job_id = publish_tileset()
-    
-    if job_id:
-        check_job_status(job_id)
-    
-    # Cleanup temp files
-    print(f"\nCleaning up temporary files...")
-    for f in tif_files:
-        if Path(f).exists():
-            Path(f).unlink()
-            print(f"  Deleted {f}")
+    # Execute workflow; intermediates live in a scratch dir (tmpfs when it has room)
+    # that is removed on exit, whether or not the workflow succeeds
+    with tempfile.TemporaryDirectory(prefix='tempo_', dir=get_scratch_dir()) as workdir:
+        print(f"Working directory: {workdir}")
+        tif_files = download_and_convert_nc_files(workdir)
+        
+        if not tif_files:
+            print("\n❌ No TIF files created")
+            return
+        
+        print(f"\n✓ Created {len(tif_files)} TIF files")
+        
+        if not upload_source_files(tif_files):
+            print("\n❌ Workflow stopped due to upload errors")
+            return
+        
+        recipe = create_recipe()
+        
+        if not create_tileset(recipe):
+            print("\n❌ Workflow stopped due to tileset creation error")
+            return
+        
+        job_id = publish_tileset()
+        
+        if job_id:
+            check_job_status(job_id)
     
     print(f"\n{'#'*60}")
     print("WORKFLOW COMPLETE")